@@ -11,26 +11,47 @@ import struct
 import threading
 from pathlib import Path
 from datetime import datetime
-import shutil
-import subprocess
+import socket
+import ctypes
 import os
 
 
+# Per-frame timestamp record: little-endian int64
+_TS_STRUCT = struct.Struct("<q")
+
+# Timestamps are packed into a fixed ring buffer by the frame callback and
+# drained to disk by a background writer thread, so the callback never waits
+# on the SD card. The writer is woken every N frames and at least once per
+# drain interval.
+_TS_RING_SLOTS = 4096
+_TS_WAKE_FRAMES = 256
+_TS_DRAIN_INTERVAL = 1.0  # seconds
+
+# Stats are sampled on a fixed monotonic schedule so time spent printing and
+# updating systemd does not stretch the reporting period.
+_STATS_PERIOD = 1.0  # seconds
+
+
 # --- systemd status integration -------------------------------------------
 # If this program is launched by systemd with Type=notify, we can expose a
 # compact runtime status line in `systemctl status <service>`.
-# This is a no-op when not running under systemd (no NOTIFY_SOCKET) or when
-# systemd-notify is not available.
-_SYSTEMD_NOTIFY = shutil.which("systemd-notify")
+# This is a no-op when not running under systemd (no NOTIFY_SOCKET).
+# Messages are sent as datagrams straight to the notify socket (the sd_notify
+# protocol) rather than by forking systemd-notify once per stats tick.
+_notify_sock = None
 
 
 def _systemd_notify(msg: str) -> None:
-    if not _SYSTEMD_NOTIFY:
-        return
-    if "NOTIFY_SOCKET" not in os.environ:
+    global _notify_sock
+    addr = os.environ.get("NOTIFY_SOCKET")
+    if not addr:
         return
+    if addr.startswith("@"):
+        addr = "\0" + addr[1:]  # abstract namespace socket
     try:
-        subprocess.run([_SYSTEMD_NOTIFY, msg], check=False)
+        if _notify_sock is None:
+            _notify_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC)
+        _notify_sock.sendto(msg.encode(), addr)
     except Exception:
         # Never allow status updates to affect recording.
         pass
@@ -44,14 +65,65 @@ def systemd_set_status(status: str) -> None:
     _systemd_notify(f"STATUS={status}")
 
 
+# --- Disk space preallocation ------------------------------------------------
+# The timestamp file grows by small appends for hours. Reserving its space up
+# front lets the filesystem hand out contiguous extents once instead of on
+# every append. FALLOC_FL_KEEP_SIZE reserves blocks without changing the file
+# size, so the data never gains zero padding. Unused blocks are released when
+# the file is closed; blocks left behind by a crash or power loss are
+# reclaimed from earlier recordings at the next start. The video file is not
+# preallocated, since its size is unbounded and a large reservation would be
+# lost on every unclean exit. Best effort only: skipped on filesystems or
+# platforms without fallocate().
+_FALLOC_FL_KEEP_SIZE = 0x01
+_TS_PREALLOC_BYTES = _TS_STRUCT.size * 30 * 60 * 60  # one hour at 30 fps
+
+try:
+    _fallocate = ctypes.CDLL(None, use_errno=True).fallocate64
+    _fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+except (AttributeError, OSError):
+    _fallocate = None
+
+
+def _reserve_space(fd: int, size: int) -> None:
+    if _fallocate is None:
+        return
+    try:
+        _fallocate(fd, _FALLOC_FL_KEEP_SIZE, 0, size)
+    except Exception:
+        pass
+
+
+def _release_reserved_space(fd: int) -> None:
+    try:
+        os.ftruncate(fd, os.fstat(fd).st_size)
+    except Exception:
+        pass
+
+
+def _reclaim_reserved_space(root: Path) -> None:
+    """Release blocks still reserved past EOF by recordings that didn't close cleanly."""
+    for path in root.glob("*/*"):
+        try:
+            st = path.stat()
+            if not path.is_file() or st.st_blocks * 512 <= st.st_size:
+                continue
+            fd = os.open(path, os.O_WRONLY | os.O_CLOEXEC)
+        except OSError:
+            continue
+        try:
+            _release_reserved_space(fd)
+        finally:
+            os.close(fd)
+
+
 # --- Camera / Recording code ------------------------------------------------
 
 try:
     from picamera2 import Picamera2
     # from picamera2.encoders import H264Encoder
     # from picamera2.outputs import FileOutput
-    from picamera2.encoders import JpegEncoder
-    from picamera2.encoders import MJPEGEncoder
+    from picamera2.encoders import MJPEGEncoder  # V4L2 hardware JPEG encoder
     from picamera2.outputs import FileOutput
 except ImportError:
     print("picamera2 not installed. Install with: sudo apt install python3-picamera2")
@@ -67,66 +139,127 @@ class RawTimestampOutput(FileOutput):
     def __init__(self, video_file, timestamp_file, camera_id):
         super().__init__(video_file)
         self.camera_id = camera_id
-        self.ts_file = open(timestamp_file, "wb")  # Binary write
-        self.last_ts = None
-        self.count = 0
-
-        # Stats tracking
-        self.intervals = []
-        self.interval_sum = 0
-        self.interval_min = float("inf")
-        self.interval_max = 0
+        self._super_output = super().outputframe  # bound once, called per frame
+        # Raw fd: the ring is drained with large os.write() calls, so Python's
+        # buffered file layer would only add a copy and a lock per write.
+        self._ts_fd = os.open(
+            timestamp_file,
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND | os.O_CLOEXEC,
+            0o644,
+        )
+        _reserve_space(self._ts_fd, _TS_PREALLOC_BYTES)
+        self.last_ts_us = None
+        self.count = 0  # frames received (ring head)
+
+        # Timestamp ring, drained by _ts_writer
+        self._ts_ring = bytearray(_TS_STRUCT.size * _TS_RING_SLOTS)
+        self._ts_tail = 0  # frames written to disk
+        self._ts_lock = threading.Lock()
+        self._ts_wake = threading.Event()
+        self._ts_stop = False
+        self._ts_thread = threading.Thread(target=self._ts_writer, daemon=True)
+        self._ts_thread.start()
+
+        # Stats tracking in integer microseconds (running totals only, reset by get_stats)
+        self.interval_count = 0
+        self.interval_sum_us = 0
+        self.interval_min_us = float("inf")
+        self.interval_max_us = 0
 
     def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=None):
-        # Convert to seconds (float64) for interval computation
-        ts = timestamp / 1e6 if timestamp else 0.0
-
-        # Write raw timestamp to disk immediately (8 bytes, little-endian int64)
-        self.ts_file.write(struct.pack("<q", timestamp))
+        # Queue raw timestamp (8 bytes, little-endian int64) for the writer thread
+        if self.count - self._ts_tail >= _TS_RING_SLOTS:
+            # Writer is a full ring behind; drain inline rather than drop frames
+            self._drain_timestamps()
+        _TS_STRUCT.pack_into(self._ts_ring, (self.count % _TS_RING_SLOTS) * _TS_STRUCT.size, timestamp)
         self.count += 1
+        if self.count % _TS_WAKE_FRAMES == 0:
+            self._ts_wake.set()
 
-        # Calculate interval for stats
-        if self.last_ts is not None:
-            interval = (ts - self.last_ts) * 1000  # ms
-            self.intervals.append(interval)
-            self.interval_sum += interval
-            if interval < self.interval_min:
-                self.interval_min = interval
-            if interval > self.interval_max:
-                self.interval_max = interval
+        # Calculate interval for stats (us; converted to ms in get_stats)
+        if self.last_ts_us is not None:
+            interval = timestamp - self.last_ts_us
+            mn = self.interval_min_us
+            mx = self.interval_max_us
+            self.interval_count += 1
+            self.interval_sum_us += interval
+            self.interval_min_us = interval if interval < mn else mn
+            self.interval_max_us = interval if interval > mx else mx
 
-        self.last_ts = ts
+        self.last_ts_us = timestamp
 
         # Write frame to video output
-        return super().outputframe(frame, keyframe, timestamp, packet, audio)
+        return self._super_output(frame, keyframe, timestamp, packet, audio)
 
     def get_stats(self):
         """Get current statistics and reset tracking"""
-        if not self.intervals:
+        if not self.interval_count:
             return None
 
         stats = {
             "count": self.count,
-            "avg": self.interval_sum / len(self.intervals),
-            "min": self.interval_min,
-            "max": self.interval_max,
+            "avg": self.interval_sum_us / self.interval_count / 1000.0,
+            "min": self.interval_min_us / 1000.0,
+            "max": self.interval_max_us / 1000.0,
         }
 
         # Reset interval tracking (keep count)
-        self.intervals = []
-        self.interval_sum = 0
-        self.interval_min = float("inf")
-        self.interval_max = 0
+        self.interval_count = 0
+        self.interval_sum_us = 0
+        self.interval_min_us = float("inf")
+        self.interval_max_us = 0
 
         return stats
 
+    def _drain_timestamps(self):
+        """Write all queued timestamps from the ring to disk"""
+        with self._ts_lock:
+            head = self.count
+            tail = self._ts_tail
+            if head == tail:
+                return
+
+            ring = memoryview(self._ts_ring)
+            start = (tail % _TS_RING_SLOTS) * _TS_STRUCT.size
+            end = (head % _TS_RING_SLOTS) * _TS_STRUCT.size
+            if start < end:
+                self._write_ts(ring[start:end])
+            else:
+                # Queued span wraps around the end of the ring
+                self._write_ts(ring[start:])
+                self._write_ts(ring[:end])
+            self._ts_tail = head
+
+    def _write_ts(self, data):
+        """Write a block of timestamps to the raw fd, handling short writes"""
+        while data:
+            data = data[os.write(self._ts_fd, data):]
+
+    def _ts_writer(self):
+        """Background thread draining the timestamp ring to disk"""
+        while not self._ts_stop:
+            self._ts_wake.wait(_TS_DRAIN_INTERVAL)
+            self._ts_wake.clear()
+            self._drain_timestamps()
+
     def close(self):
-        """Close timestamp file"""
-        self.ts_file.close()
+        """Stop the writer thread, write remaining timestamps and close the file"""
+        if self._ts_fd is not None:
+            self._ts_stop = True
+            self._ts_wake.set()
+            self._ts_thread.join()
+            self._drain_timestamps()
+            _release_reserved_space(self._ts_fd)
+            os.close(self._ts_fd)
+            self._ts_fd = None
         return super().close()
 
 
 class MinimalRecorder:
+    # Pre-bound formatters for the per-camera stats line and systemd status
+    _CAM_FMT = "CAM{id}: {count:4d}f | avg={avg:5.1f}ms | min={min:5.1f}ms | max={max:6.1f}ms".format
+    _STATUS_FMT = "cam{id} frames={count} avg={avg:.1f}ms max={max:.1f}ms".format
+
     def __init__(self):
         self.cam1 = None
         self.cam2 = None
@@ -134,6 +267,9 @@ class MinimalRecorder:
         self.out2 = None
         self.running = False
 
+        # Give back space still reserved by sessions that ended uncleanly
+        _reclaim_reserved_space(Path("recordings"))
+
         # Output directory (new session per start)
         self.session = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.dir = Path(f"recordings/{self.session}")
@@ -179,11 +315,11 @@ class MinimalRecorder:
         enc1 = MJPEGEncoder()
         enc2 = MJPEGEncoder()
 
-        # Start cameras
+        # Start cameras, waiting for each to deliver its first frame
         self.cam1.start()
-        time.sleep(0.1)
+        self.cam1.capture_metadata()
         self.cam2.start()
-        time.sleep(0.1)
+        self.cam2.capture_metadata()
 
         # Start recording
         self.cam1.start_recording(enc1, self.out1)
@@ -204,41 +340,34 @@ class MinimalRecorder:
 
     def print_stats(self):
         """Print statistics every period and update systemd status if present."""
+        next_tick = time.monotonic()
         while self.running:
-            time.sleep(1)
+            next_tick += _STATS_PERIOD
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell a full period behind; resync rather than burst to catch up
+                next_tick = time.monotonic()
 
             stats1 = self.out1.get_stats() if self.out1 else None
             stats2 = self.out2.get_stats() if self.out2 else None
 
             if stats1:
                 # Camera 1
-                print(
-                    f"CAM1: {stats1['count']:4d}f | "
-                    f"avg={stats1['avg']:5.1f}ms | "
-                    f"min={stats1['min']:5.1f}ms | "
-                    f"max={stats1['max']:6.1f}ms"
-                )
+                print(self._CAM_FMT(id=1, **stats1))
 
             if stats2:
                 # Camera 2
-                print(
-                    f"CAM2: {stats2['count']:4d}f | "
-                    f"avg={stats2['avg']:5.1f}ms | "
-                    f"min={stats2['min']:5.1f}ms | "
-                    f"max={stats2['max']:6.1f}ms"
-                )
+                print(self._CAM_FMT(id=2, **stats2))
                 print()
 
             # Update systemd status line (compact summary)
             parts = []
             if stats1:
-                parts.append(
-                    f"cam1 frames={stats1['count']} avg={stats1['avg']:.1f}ms max={stats1['max']:.1f}ms"
-                )
+                parts.append(self._STATUS_FMT(id=1, **stats1))
             if stats2:
-                parts.append(
-                    f"cam2 frames={stats2['count']} avg={stats2['avg']:.1f}ms max={stats2['max']:.1f}ms"
-                )
+                parts.append(self._STATUS_FMT(id=2, **stats2))
             if parts:
                 systemd_set_status(" | ".join(parts))
 
@@ -10,10 +10,103 @@ import time
 import sys
 import os
 import base64
+import struct
+import select
 from datetime import datetime, timezone
-from pyubx2 import UBXReader
+from itertools import accumulate
 import socket
-import csv
+import selectors
+import signal
+
+# RTCM corrections are coalesced and forwarded to the receiver in one write
+# once this many bytes are pending, or this long after the first pending byte.
+RTCM_BATCH_BYTES = 1024
+RTCM_BATCH_DELAY = 0.05  # seconds
+
+# UBX data is collected in memory by the read thread and written out by the
+# log thread every LOG_WRITE_INTERVAL; the logs are fsynced at most every
+# LOG_FSYNC_INTERVAL. Disk stalls therefore never hold up serial reads.
+LOG_BUFFER_SIZE = 1 << 16
+LOG_WRITE_INTERVAL = 2.0  # seconds
+LOG_FSYNC_INTERVAL = 10.0  # seconds
+
+# fdatasync skips the metadata flush where the OS has it (not on macOS)
+fdatasync = getattr(os, 'fdatasync', os.fsync)
+
+GPS_EPOCH = datetime(1980, 1, 6, tzinfo=timezone.utc)
+GPS_WEEK_SECONDS = 7 * 24 * 3600
+
+# UBX NAV-PVT: sync chars + class/id, and the payload prefix we monitor
+# (iTOW, year, month, day, hour, min, sec, valid, tAcc, nano, fixType, flags,
+# flags2, numSV, lon, lat, height, hMSL) per the u-blox interface description
+NAV_PVT_HEADER = b'\xb5\x62\x01\x07'
+NAV_PVT = struct.Struct('<IHBBBBBBIiBBBBiiii')
+
+# Serial bytes are read straight into a fixed buffer and scanned for UBX frames
+# in place. Every received byte is logged verbatim.
+READ_BUFFER_SIZE = 1 << 16
+UBX_SYNC = b'\xb5\x62'
+UBX_OVERHEAD = 8  # sync (2) + class/id (2) + length (2) + checksum (2)
+
+# UBX CFG-VALSET (class 0x06, id 0x8A), applied to the RAM layer only so the
+# flash configuration from SheepRTK.ucf is left untouched
+CFG_VALSET_HEADER = b'\xb5\x62\x06\x8a'
+CFG_LAYER_RAM = 0x01
+
+# CFG-MSGOUT-UBX_*_UART1 keys: output rate in navigation epochs (0 = off)
+CFG_MSGOUT_UBX_NAV_PVT_UART1 = 0x20910007
+CFG_MSGOUT_UBX_NAV_SAT_UART1 = 0x20910016
+CFG_MSGOUT_UBX_NAV_STATUS_UART1 = 0x2091001b
+CFG_MSGOUT_UBX_RXM_SFRBX_UART1 = 0x20910232
+CFG_MSGOUT_UBX_RXM_RAWX_UART1 = 0x209102a5
+
+# Base fix types (NAV-PVT fixType)
+FIX_TYPE_NAMES = {
+    0: "NO FIX",
+    1: "DEAD RECKONING",
+    2: "2D FIX",
+    3: "3D FIX",
+    4: "GNSS+DR",
+    5: "TIME ONLY"
+}
+
+# Status line printed every 2 seconds
+STATUS_FMT = ("\n[%s] Fix: %-15s | Sats: %2d | Lat: %11.7f | Lon: %11.7f | Alt: %7.2fm | "
+              "Time offset: %+7.3fs | Msgs: %5d (%.1f Hz) | Logged: %.1f KB | RTCM: %.1f KB%s")
+
+
+def ubx_checksum(body):
+    """8-bit Fletcher checksum (CK_A, CK_B) over a UBX frame's class/id, length and payload"""
+    ck_a = sum(body) & 0xFF
+    # CK_B is the sum of the running CK_A values
+    ck_b = sum(accumulate(body)) & 0xFF
+    return ck_a, ck_b
+
+
+def ubx_frame(header, payload):
+    """Build a UBX frame from sync + class/id header bytes and a payload"""
+    body = header[2:] + struct.pack('<H', len(payload)) + payload
+    return header[:2] + body + bytes(ubx_checksum(body))
+
+
+# The receiver answers CFG-VALSET with UBX-ACK-ACK or UBX-ACK-NAK naming it
+CFG_VALSET_ACK = ubx_frame(b'\xb5\x62\x05\x01', CFG_VALSET_HEADER[2:])
+CFG_VALSET_NAK = ubx_frame(b'\xb5\x62\x05\x00', CFG_VALSET_HEADER[2:])
+CFG_ACK_TIMEOUT = 1.0  # seconds
+
+
+def cfg_valset_msgout(items, layers=CFG_LAYER_RAM):
+    """Build a CFG-VALSET frame setting CFG-MSGOUT (U1) keys from (key, rate) pairs"""
+    payload = struct.pack('<BBH', 0, layers, 0)  # version 0, layers, reserved
+    payload += b''.join(struct.pack('<IB', key, rate) for key, rate in items)
+    return ubx_frame(CFG_VALSET_HEADER, payload)
+
+
+def ubx_checksum_ok(buf, start, end):
+    """Check the 8-bit Fletcher checksum of the UBX frame in buf[start:end]"""
+    ck_a, ck_b = ubx_checksum(memoryview(buf)[start + 2:end - 2])
+    return buf[end - 2] == ck_a and buf[end - 1] == ck_b
+
 
 class TimeSync:
     """Track GPS time vs system time correlation"""
@@ -21,40 +114,51 @@ class TimeSync:
     def __init__(self, log_filename_base):
         self.sync_filename = f"{log_filename_base}_timesync.csv"
         self.sync_file = None
-        self.csv_writer = None
+        # Rows are queued in memory by log() and written out by flush(), so
+        # the GPS read thread never waits on the file
+        self._rows = []
+        self._rows_lock = threading.Lock()
         
     def open(self):
         """Open time sync log file"""
+        # Fixed schema, so rows are formatted directly (CRLF, as csv.writer did)
         self.sync_file = open(self.sync_filename, 'w', newline='')
-        self.csv_writer = csv.writer(self.sync_file)
-        self.csv_writer.writerow([
-            'system_time',
-            'gps_time', 
-            'gps_week',
-            'gps_tow',
-            'offset_seconds',
-            'num_satellites'
-        ])
+        self.sync_file.write(
+            "system_time,gps_time,gps_week,gps_tow,offset_seconds,num_satellites\r\n"
+        )
         print(f"✓ Time sync logging to: {self.sync_filename}")
         
     def log(self, system_time, gps_datetime, gps_week, gps_tow, num_sv):
         """Log time correlation"""
-        if self.csv_writer:
+        if self.sync_file:
             gps_timestamp = gps_datetime.timestamp()
             offset = system_time - gps_timestamp
-            self.csv_writer.writerow([
-                f"{system_time:.6f}",
-                gps_datetime.isoformat(),
-                gps_week,
-                f"{gps_tow:.3f}",
-                f"{offset:.6f}",
-                num_sv
-            ])
+            row = (
+                f"{system_time:.6f},{gps_datetime.isoformat()},{gps_week},"
+                f"{gps_tow:.3f},{offset:.6f},{num_sv}\r\n"
+            )
+            with self._rows_lock:
+                self._rows.append(row)
+    
+    def flush(self):
+        """Push queued rows to the OS"""
+        if self.sync_file:
+            with self._rows_lock:
+                rows, self._rows = self._rows, []
+            if rows:
+                self.sync_file.write(''.join(rows))
             self.sync_file.flush()
     
+    def sync(self):
+        """Push queued rows to the OS and wait for them to reach the disk"""
+        if self.sync_file:
+            self.flush()
+            fdatasync(self.sync_file.fileno())
+    
     def close(self):
         """Close time sync log"""
         if self.sync_file:
+            self.sync()
             self.sync_file.close()
             print(f"✓ Time sync log closed: {self.sync_filename}")
 
@@ -97,6 +201,9 @@ class NTRIPClient:
             if "200 OK" not in response:
                 raise Exception(f"NTRIP connection failed: {response}")
             
+            # Corrections are read with a selector from here on
+            self.socket.setblocking(False)
+            
             auth_str = " (authenticated)" if self.username else " (no auth)"
             print(f"✓ Connected to NTRIP: {self.host}:{self.port}/{self.mountpoint}{auth_str}")
             return True
@@ -106,7 +213,7 @@ class NTRIPClient:
             return False
     
     def read_corrections(self):
-        """Read RTCM corrections from NTRIP stream"""
+        """Read RTCM corrections from NTRIP stream (b'' means the caster closed it)"""
         if self.socket:
             try:
                 data = self.socket.recv(1024)
@@ -125,14 +232,28 @@ class NTRIPClient:
 class GPSLogger:
     """Main GPS logger class with time synchronization"""
     
-    def __init__(self, serial_port, baudrate=230400, ntrip_config=None):
+    # Fixed attribute layout: the latest NAV-PVT fields are updated on every
+    # solution, and slot access is cheaper than dict item assignment.
+    __slots__ = (
+        'serial_port', 'baudrate', 'ntrip_config', 'msg_config',
+        'ser', 'ntrip', '_read_buf',
+        'log_filename_base', 'log_filename', 'logfile', '_pending_ubx', '_pending_lock',
+        'timesync', 'last_timesync_log',
+        'stats',
+        'last_fix_type', 'last_carr_soln', 'last_num_sv',
+        'last_lat', 'last_lon', 'last_height', 'time_offset',
+        'running', 'ntrip_thread', 'read_thread', 'log_thread',
+    )
+    
+    def __init__(self, serial_port, baudrate=230400, ntrip_config=None, msg_config=None):
         self.serial_port = serial_port
         self.baudrate = baudrate
         self.ntrip_config = ntrip_config
+        self.msg_config = msg_config
         
         # Serial connection
         self.ser = None
-        self.ubr = None
+        self._read_buf = bytearray(READ_BUFFER_SIZE)
         
         # NTRIP client
         self.ntrip = None
@@ -146,30 +267,35 @@ class GPSLogger:
         self.log_filename_base = os.path.join(log_dir, f"gps_log_{timestamp}")
         self.log_filename = f"{self.log_filename_base}.ubx"
         self.logfile = None
+        self._pending_ubx = bytearray()  # written out by flush_log()
+        self._pending_lock = threading.Lock()
         
         # Time synchronization
         self.timesync = TimeSync(self.log_filename_base)
-        self.last_timesync_log = 0
+        self.last_timesync_log = float('-inf')  # time.monotonic() of last row
         
-        # Statistics
+        # Statistics (aggregate counters)
         self.stats = {
             'messages': 0,
             'bytes_logged': 0,
             'rtcm_bytes': 0,
-            'start_time': None,
-            'last_fix_type': 0,
-            'last_carr_soln': 0,  # Carrier solution status (0=none, 1=float, 2=fixed)
-            'last_num_sv': 0,
-            'last_lat': 0.0,
-            'last_lon': 0.0,
-            'last_height': 0.0,
-            'time_offset': 0.0  # GPS time - system time
+            'start_time': None
         }
         
+        # Latest navigation solution
+        self.last_fix_type = 0
+        self.last_carr_soln = 0  # Carrier solution status (0=none, 1=float, 2=fixed)
+        self.last_num_sv = 0
+        self.last_lat = 0.0
+        self.last_lon = 0.0
+        self.last_height = 0.0
+        self.time_offset = 0.0  # GPS time - system time
+        
         # Threading
         self.running = False
         self.ntrip_thread = None
         self.read_thread = None
+        self.log_thread = None
         
     def connect_serial(self):
         """Connect to GPS module via serial"""
@@ -179,13 +305,77 @@ class GPSLogger:
                 self.baudrate,
                 timeout=1
             )
-            self.ubr = UBXReader(self.ser)
             print(f"✓ Connected to GPS: {self.serial_port} @ {self.baudrate} baud")
+            self.set_low_latency()
             return True
         except Exception as e:
             print(f"✗ Serial connection failed: {e}")
             return False
     
+    def set_low_latency(self):
+        """Ask the tty driver to deliver received bytes immediately (ASYNC_LOW_LATENCY)"""
+        try:
+            self.ser.set_low_latency_mode(True)
+            return True
+        except (AttributeError, NotImplementedError, ValueError, OSError):
+            pass
+        
+        # USB-serial adapters (FTDI etc.) expose the receive latency timer in sysfs
+        tty = os.path.basename(os.path.realpath(self.serial_port))
+        try:
+            with open(f"/sys/bus/usb-serial/devices/{tty}/latency_timer", 'w') as f:
+                f.write("1")
+            return True
+        except OSError:
+            print("⚠ Could not enable low-latency serial mode")
+            return False
+    
+    def configure_messages(self):
+        """Set the receiver's UBX message output rates (RAM layer) from msg_config"""
+        if not self.msg_config:
+            return True
+        try:
+            self.write_serial(cfg_valset_msgout(self.msg_config))
+            acked = self.wait_for_valset_ack()
+        except Exception as e:
+            print(f"⚠ Message output configuration failed: {e}")
+            return False
+        
+        if acked:
+            print(f"✓ Message output configured ({len(self.msg_config)} settings, RAM only)")
+            return True
+        if acked is None:
+            print("⚠ Message output configuration sent, but the receiver did not acknowledge it")
+        else:
+            print("⚠ Message output configuration rejected by the receiver (ACK-NAK)")
+        return False
+    
+    def wait_for_valset_ack(self):
+        """Wait for the receiver's reply to CFG-VALSET: True (ACK), False (NAK) or None (timeout)"""
+        # Runs before logging starts, so the bytes read here are not logged
+        fd = self.ser.fd
+        received = bytearray()
+        deadline = time.monotonic() + CFG_ACK_TIMEOUT
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if not select.select([fd], [], [], remaining)[0]:
+                continue
+            try:
+                data = os.read(fd, READ_BUFFER_SIZE)
+            except BlockingIOError:
+                continue
+            if not data:
+                return None  # port closed
+            received += data
+            if CFG_VALSET_ACK in received:
+                return True
+            if CFG_VALSET_NAK in received:
+                return False
+            # Keep only what could be the start of a reply split across reads
+            del received[:-len(CFG_VALSET_ACK)]
+    
     def connect_ntrip(self):
         """Connect to NTRIP server if configured"""
         if not self.ntrip_config:
@@ -204,7 +394,7 @@ class GPSLogger:
     def open_logfile(self):
         """Open log file for writing"""
         try:
-            self.logfile = open(self.log_filename, 'wb')
+            self.logfile = open(self.log_filename, 'wb', buffering=LOG_BUFFER_SIZE)
             print(f"✓ Logging UBX to: {self.log_filename}")
             self.timesync.open()
             return True
@@ -212,147 +402,288 @@ class GPSLogger:
             print(f"✗ Failed to open log file: {e}")
             return False
     
+    def flush_log(self, sync=False):
+        """Write buffered UBX data and time sync rows out, optionally syncing both to disk"""
+        # Take the pending data under the lock; the (possibly slow) write
+        # happens outside it so the read thread can keep appending. The
+        # buffer is emptied even if the write fails, so a failing disk
+        # can't grow it without bound.
+        with self._pending_lock:
+            data = bytes(self._pending_ubx)
+            self._pending_ubx.clear()
+        if data:
+            self.logfile.write(data)
+        if sync:
+            self.logfile.flush()
+            os.fsync(self.logfile.fileno())
+            self.timesync.sync()
+        else:
+            self.timesync.flush()
+    
     def ntrip_worker(self):
         """Thread worker to read NTRIP corrections and send to GPS"""
         print("⚡ NTRIP correction thread started")
         
         rtcm_count = 0
-        last_rtcm_time = time.time()
+        last_rtcm_time = time.monotonic()
+        
+        # Corrections waiting to be forwarded, and when the oldest byte arrived
+        pending = bytearray()
+        pending_since = 0.0
+        
+        sel = selectors.DefaultSelector()
+        sel.register(self.ntrip.socket, selectors.EVENT_READ)
         
         while self.running and self.ntrip:
             try:
-                corrections = self.ntrip.read_corrections()
-                if corrections and len(corrections) > 0:
+                # Wake up for new data, or when the pending batch is due
+                if pending:
+                    timeout = max(0.0, pending_since + RTCM_BATCH_DELAY - time.monotonic())
+                else:
+                    timeout = 0.5
+                
+                if sel.select(timeout):
+                    corrections = self.ntrip.read_corrections()
+                    if corrections:
+                        if not pending:
+                            pending_since = time.monotonic()
+                        pending += corrections
+                    elif corrections == b'':
+                        print("\n⚠ NTRIP stream closed by caster")
+                        break
+                
+                if pending and (len(pending) >= RTCM_BATCH_BYTES or
+                                time.monotonic() - pending_since >= RTCM_BATCH_DELAY):
                     # Send RTCM corrections to GPS module
-                    bytes_written = self.ser.write(corrections)
-                    self.ser.flush()  # Ensure data is sent immediately
-                    self.stats['rtcm_bytes'] += len(corrections)
+                    self.write_serial(pending)
+                    self.stats['rtcm_bytes'] += len(pending)
                     rtcm_count += 1
                     
-                    # Debug output every 10 RTCM messages
+                    # Debug output every 10 RTCM batches
                     if rtcm_count % 10 == 0:
-                        elapsed = time.time() - last_rtcm_time
+                        elapsed = time.monotonic() - last_rtcm_time
                         rate = 10.0 / elapsed if elapsed > 0 else 0
-                        print(f"\n[RTCM] Sent {len(corrections)} bytes (rate: {rate:.1f} msg/s, total: {self.stats['rtcm_bytes']} bytes)")
-                        last_rtcm_time = time.time()
-                else:
-                    time.sleep(0.1)  # Small delay if no data
+                        print(f"\n[RTCM] Sent {len(pending)} bytes (rate: {rate:.1f} msg/s, total: {self.stats['rtcm_bytes']} bytes)")
+                        last_rtcm_time = time.monotonic()
+                    
+                    pending.clear()
                     
             except Exception as e:
                 print(f"⚠ NTRIP error: {e}")
                 time.sleep(1)
         
+        sel.close()
         print("⚡ NTRIP correction thread stopped")
     
+    def write_serial(self, data):
+        """Write all of data straight to the serial fd, handling short writes"""
+        fd = self.ser.fd
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[os.write(fd, view):]
+            except BlockingIOError:
+                # tty output buffer full (pyserial opens the port non-blocking)
+                select.select([], [fd], [], 1.0)
+    
+    def read_chunk(self, view, head):
+        """Wait for serial data and read it into view[head:]; returns the byte count (0 if none)"""
+        try:
+            fd = self.ser.fd
+            if not select.select([fd], [], [], 1.0)[0]:
+                return 0
+            n = os.readv(fd, [view[head:]])
+            if not n:
+                raise serial.SerialException("device reports readiness to read but returned no data")
+            return n
+        except Exception as e:
+            if self.running:  # Only print if not shutting down
+                print(f"\n⚠ Read error: {e}")
+                time.sleep(0.1)
+            return 0
+    
     def read_worker(self):
         """Thread worker to read GPS data and log it"""
         print("⚡ GPS read thread started")
         
-        last_status_time = time.time()
+        # Interval bookkeeping uses the monotonic clock (immune to NTP steps);
+        # wall-clock time is only read when a time sync row is recorded
+        last_status_time = time.monotonic()
+        last_in_waiting_check = last_status_time
+        warned_in_waiting = 0  # backlog at the last buffer warning
         parse_errors = 0
-        total_reads = 0
-        
+        total_frames = 0
+        
+        buf = self._read_buf
+        view = memoryview(buf)
+        
+        # Bind the per-iteration lookups to locals once; none of these objects
+        # are replaced while the thread runs (self.running is still re-read)
+        monotonic = time.monotonic
+        find = buf.find
+        read_chunk = self.read_chunk
+        pending = self._pending_ubx
+        pending_lock = self._pending_lock
+        stats = self.stats
+        process_nav_pvt = self.process_nav_pvt
+        
+        head = 0  # end of received data
+        tail = 0  # start of data not yet scanned for frames
+        
+        # Only the I/O calls are guarded by try/except; the frame walk below
+        # runs without a handler around it
         while self.running:
-            try:
-                # Record system time
-                system_time = time.time()
-                
-                # Check serial buffer usage (if supported)
+            now = monotonic()
+            
+            # Check serial buffer usage (if supported) twice a second, and only
+            # warn again while the backlog keeps growing
+            if now - last_in_waiting_check >= 0.5:
+                last_in_waiting_check = now
                 try:
                     in_waiting = self.ser.in_waiting
                     if in_waiting > 32768:  # More than half full
-                        print(f"\n⚠ Serial buffer high: {in_waiting} bytes waiting")
+                        if in_waiting > warned_in_waiting:
+                            print(f"\n⚠ Serial buffer high: {in_waiting} bytes waiting")
+                            warned_in_waiting = in_waiting
+                    else:
+                        warned_in_waiting = 0
                 except:
                     pass
+            
+            if tail:
+                # Move the unscanned remainder (at most one partial frame) to the front
+                head -= tail
+                view[:head] = view[tail:tail + head]
+                tail = 0
+            
+            # Read whatever has arrived straight into the buffer
+            n = read_chunk(view, head)
+            if n:
+                # Log raw binary data (for PPK)
+                with pending_lock:
+                    pending += view[head:head + n]
+                stats['bytes_logged'] += n
+                head += n
                 
-                # Read UBX message
-                total_reads += 1
-                (raw_data, parsed_msg) = self.ubr.read()
-                
-                if raw_data:
-                    # Log raw binary data (for PPK)
-                    self.logfile.write(raw_data)
-                    self.stats['bytes_logged'] += len(raw_data)
-                    self.stats['messages'] += 1
+                # Walk the complete UBX frames received so far
+                while True:
+                    start = find(UBX_SYNC, tail, head)
+                    if start < 0:
+                        # Keep a trailing first sync byte for the next read
+                        tail = head - 1 if head > tail and buf[head - 1] == 0xB5 else head
+                        break
+                    if head - start < 6:
+                        tail = start  # length field not received yet
+                        break
+                    end = start + UBX_OVERHEAD + (buf[start + 4] | buf[start + 5] << 8)
+                    if end - start > len(buf):
+                        tail = start + 2  # impossible length, so not a real sync
+                        continue
+                    if end > head:
+                        tail = start  # rest of the frame not received yet
+                        break
                     
-                    # Parse specific messages for monitoring
-                    # Note: parsed_msg may be None if message couldn't be parsed
-                    if parsed_msg and parsed_msg.identity == 'NAV-PVT':
-                        self.stats['last_fix_type'] = parsed_msg.fixType
-                        self.stats['last_num_sv'] = parsed_msg.numSV
-                        self.stats['last_lat'] = parsed_msg.lat
-                        self.stats['last_lon'] = parsed_msg.lon
-                        self.stats['last_height'] = parsed_msg.height / 1000.0  # mm to m
-                        
-                        # Store carrier solution status for RTK detection
-                        self.stats['last_carr_soln'] = getattr(parsed_msg, 'carrSoln', 0)
+                    total_frames += 1
+                    if ubx_checksum_ok(buf, start, end):
+                        stats['messages'] += 1
+                        tail = end
                         
-                        # Log time synchronization every 10 seconds
-                        if system_time - self.last_timesync_log >= 10.0:
-                            try:
-                                gps_datetime = datetime(
-                                    parsed_msg.year, parsed_msg.month, parsed_msg.day,
-                                    parsed_msg.hour, parsed_msg.min, parsed_msg.second,
-                                    microsecond=int(parsed_msg.nano / 1000),
-                                    tzinfo=timezone.utc  # GPS time is UTC-based
-                                )
-                                
-                                # Calculate GPS week and time of week
-                                gps_epoch = datetime(1980, 1, 6, tzinfo=timezone.utc)
-                                delta = gps_datetime - gps_epoch
-                                gps_week = int(delta.total_seconds() / (7 * 24 * 3600))
-                                gps_tow = delta.total_seconds() % (7 * 24 * 3600)
-                                
-                                # Log correlation
-                                self.timesync.log(
-                                    system_time,
-                                    gps_datetime,
-                                    gps_week,
-                                    gps_tow,
-                                    parsed_msg.numSV
-                                )
-                                
-                                # Calculate offset for display
-                                gps_timestamp = gps_datetime.timestamp()
-                                self.stats['time_offset'] = system_time - gps_timestamp
-                                
-                                self.last_timesync_log = system_time
-                            except:
-                                pass
-                    elif not parsed_msg:
-                        # Track parse errors
+                        # Parse specific messages for monitoring
+                        if (buf[start + 2] == 0x01 and buf[start + 3] == 0x07 and
+                                end - start - UBX_OVERHEAD >= NAV_PVT.size):
+                            process_nav_pvt(buf, start + 6, now)
+                    else:
+                        # Track parse errors; resync after this sync word
+                        tail = start + 2
                         parse_errors += 1
                         if parse_errors % 100 == 0:
-                            error_rate = (parse_errors / total_reads) * 100
-                            print(f"\n⚠ Parse error rate: {error_rate:.1f}% ({parse_errors}/{total_reads})")
-                    
-                    # Print status every 2 seconds
-                    if time.time() - last_status_time >= 2.0:
-                        self.print_status()
-                        last_status_time = time.time()
-                        
-            except Exception as e:
-                if self.running:  # Only print if not shutting down
-                    print(f"\n⚠ Read error: {e}")
-                    time.sleep(0.1)
+                            error_rate = (parse_errors / total_frames) * 100
+                            print(f"\n⚠ Parse error rate: {error_rate:.1f}% ({parse_errors}/{total_frames})")
+            
+            # Print status every 2 seconds (the log thread writes the data out)
+            if now - last_status_time >= 2.0:
+                last_status_time = now
+                self.print_status()
         
         print("⚡ GPS read thread stopped")
     
+    def log_worker(self):
+        """Thread worker to write buffered log data out and periodically sync it to disk"""
+        next_write = time.monotonic() + LOG_WRITE_INTERVAL
+        last_fsync_time = time.monotonic()
+        
+        while self.running:
+            delay = next_write - time.monotonic()
+            if delay > 0:
+                time.sleep(min(delay, 0.5))  # re-check self.running while waiting
+                continue
+            next_write += LOG_WRITE_INTERVAL
+            
+            now = time.monotonic()
+            sync = now - last_fsync_time >= LOG_FSYNC_INTERVAL
+            try:
+                self.flush_log(sync)
+                if sync:
+                    last_fsync_time = now
+            except Exception as e:
+                print(f"\n⚠ Log write error: {e}")
+    
+    def process_nav_pvt(self, buf, offset, now):
+        """Update monitoring state from a NAV-PVT payload at buf[offset:]"""
+        (itow, year, month, day, hour, minute, second, _valid, _tacc, nano,
+         fix_type, flags, _flags2, num_sv, lon, lat, height, _hmsl) = \
+            NAV_PVT.unpack_from(buf, offset)
+        
+        self.last_fix_type = fix_type
+        self.last_num_sv = num_sv
+        self.last_lat = lat * 1e-7
+        self.last_lon = lon * 1e-7
+        self.last_height = height / 1000.0  # mm to m
+        
+        # Store carrier solution status for RTK detection (flags bits 6-7)
+        self.last_carr_soln = flags >> 6
+        
+        # Log time synchronization every 10 seconds
+        if now - self.last_timesync_log >= 10.0:
+            try:
+                # Record system time
+                system_time = time.time()
+                
+                gps_datetime = datetime(
+                    year, month, day, hour, minute, second,
+                    microsecond=int(nano / 1000),
+                    tzinfo=timezone.utc  # GPS time is UTC-based
+                )
+                
+                # GPS time of week comes straight from the receiver (iTOW, ms).
+                # UTC trails GPS time only by the leap seconds, so rounding
+                # the remaining difference gives the week number exactly.
+                gps_tow = itow / 1000.0
+                utc_secs = (gps_datetime - GPS_EPOCH).total_seconds()
+                gps_week = round((utc_secs - gps_tow) / GPS_WEEK_SECONDS)
+                
+                # Log correlation
+                self.timesync.log(
+                    system_time,
+                    gps_datetime,
+                    gps_week,
+                    gps_tow,
+                    num_sv
+                )
+                
+                # Calculate offset for display
+                gps_timestamp = gps_datetime.timestamp()
+                self.time_offset = system_time - gps_timestamp
+                
+                self.last_timesync_log = now
+            except:
+                pass
+    
     def print_status(self):
         """Print current GPS status"""
-        # Base fix types
-        fix_types = {
-            0: "NO FIX",
-            1: "DEAD RECKONING",
-            2: "2D FIX",
-            3: "3D FIX",
-            4: "GNSS+DR",
-            5: "TIME ONLY"
-        }
-        
         # Determine actual fix status combining fixType and carrSoln
-        fix_type = self.stats['last_fix_type']
-        carr_soln = self.stats['last_carr_soln']
+        fix_type = self.last_fix_type
+        carr_soln = self.last_carr_soln
         
         if carr_soln == 2:
             # RTK Fixed solution
@@ -362,7 +693,7 @@ class GPSLogger:
             fix_str = "RTK FLOAT"
         else:
             # Use base fix type
-            fix_str = fix_types.get(fix_type, "UNKNOWN")
+            fix_str = FIX_TYPE_NAMES.get(fix_type, "UNKNOWN")
         
         # Estimate data rate
         if self.stats['start_time']:
@@ -371,17 +702,20 @@ class GPSLogger:
         else:
             msg_rate = 0
         
-        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] "
-              f"Fix: {fix_str:15s} | "
-              f"Sats: {self.stats['last_num_sv']:2d} | "
-              f"Lat: {self.stats['last_lat']:11.7f} | "
-              f"Lon: {self.stats['last_lon']:11.7f} | "
-              f"Alt: {self.stats['last_height']:7.2f}m | "
-              f"Time offset: {self.stats['time_offset']:+7.3f}s | "
-              f"Msgs: {self.stats['messages']:5d} ({msg_rate:.1f} Hz) | "
-              f"Logged: {self.stats['bytes_logged']/1024:.1f} KB | "
-              f"RTCM: {self.stats['rtcm_bytes']/1024:.1f} KB{' !!' if self.ntrip else ''}",
-              end='', flush=True)
+        sys.stdout.write(STATUS_FMT % (
+            time.strftime('%H:%M:%S'),
+            fix_str,
+            self.last_num_sv,
+            self.last_lat,
+            self.last_lon,
+            self.last_height,
+            self.time_offset,
+            self.stats['messages'], msg_rate,
+            self.stats['bytes_logged'] / 1024,
+            self.stats['rtcm_bytes'] / 1024,
+            ' !!' if self.ntrip else ''
+        ))
+        sys.stdout.flush()
     
     def start(self):
         """Start logging"""
@@ -392,6 +726,7 @@ class GPSLogger:
         # Connect to GPS
         if not self.connect_serial():
             return False
+        self.configure_messages()
         
         # Connect to NTRIP
         if not self.connect_ntrip():
@@ -414,6 +749,10 @@ class GPSLogger:
         self.read_thread = threading.Thread(target=self.read_worker, daemon=True)
         self.read_thread.start()
         
+        # Start log writer thread
+        self.log_thread = threading.Thread(target=self.log_worker, daemon=True)
+        self.log_thread.start()
+        
         print("\n✓ Logging started - Press Ctrl+C to stop\n")
         print("Status display updates every 2 seconds:")
         print("Time offset shows (System Time - GPS Time)")
@@ -432,11 +771,14 @@ class GPSLogger:
         # Wait for threads to finish
         if self.read_thread:
             self.read_thread.join(timeout=2)
+        if self.log_thread:
+            self.log_thread.join(timeout=2)
         if self.ntrip_thread:
             self.ntrip_thread.join(timeout=2)
         
         # Close connections
         if self.logfile:
+            self.flush_log(sync=True)
             self.logfile.close()
             print(f"✓ Log file closed: {self.log_filename}")
         
@@ -459,7 +801,7 @@ class GPSLogger:
             print(f"  Messages: {self.stats['messages']} ({avg_rate:.1f} Hz average)")
             print(f"  Data logged: {self.stats['bytes_logged']/1024/1024:.2f} MB")
             print(f"  RTCM received: {self.stats['rtcm_bytes']/1024:.1f} KB")
-            print(f"  Final time offset: {self.stats['time_offset']:+.3f} seconds")
+            print(f"  Final time offset: {self.time_offset:+.3f} seconds")
         
         print(f"\n✓ Shutdown complete\n")
 
@@ -488,15 +830,35 @@ def main():
         'password': None   # Or your password
     }
     
+    # UBX message output rates on UART1, in navigation epochs (0 = off), set in
+    # RAM at startup (set to None to keep the receiver's stored configuration).
+    # NAV-PVT is monitored here and RXM-RAWX/SFRBX are needed for PPK; NAV-SAT
+    # is by far the largest of the remaining messages and is turned off.
+    MSG_CONFIG = [
+        (CFG_MSGOUT_UBX_NAV_PVT_UART1, 1),
+        (CFG_MSGOUT_UBX_RXM_RAWX_UART1, 1),
+        (CFG_MSGOUT_UBX_RXM_SFRBX_UART1, 1),
+        (CFG_MSGOUT_UBX_NAV_STATUS_UART1, 1),
+        (CFG_MSGOUT_UBX_NAV_SAT_UART1, 0),
+    ]
+    
     # ===================================
     
     # Create logger
     logger = GPSLogger(
         serial_port=SERIAL_PORT,
         baudrate=BAUDRATE,
-        ntrip_config=NTRIP_CONFIG
+        ntrip_config=NTRIP_CONFIG,
+        msg_config=MSG_CONFIG
     )
     
+    # systemd stops the service with SIGTERM; shut down the same way as
+    # Ctrl+C so the logs are flushed and synced before exiting
+    def signal_handler(sig, frame):
+        raise KeyboardInterrupt
+    
+    signal.signal(signal.SIGTERM, signal_handler)
+    
     # Start logging
     if logger.start():
         try:
@@ -5,11 +5,100 @@ Analyzes logged UBX files to verify they're suitable for PPK processing
 """
 
 import sys
-from collections import defaultdict
+import struct
 from datetime import datetime, timedelta
-from pyubx2 import UBXReader
+from itertools import accumulate, compress
+import mmap
 import os
 
+# Messages are identified by an integer key, (class << 8) | id
+NAV_PVT = 0x0107
+RXM_RAWX = 0x0215
+RXM_SFRBX = 0x0213
+NAV_STATUS = 0x0103
+NAV_SAT = 0x0135
+
+# Names of the messages checked for PPK
+MESSAGE_NAMES = {
+    NAV_PVT: 'NAV-PVT',
+    RXM_RAWX: 'RXM-RAWX',
+    RXM_SFRBX: 'RXM-SFRBX',
+    NAV_STATUS: 'NAV-STATUS',
+    NAV_SAT: 'NAV-SAT',
+}
+
+# pyubx2 is only used to name the other messages; without it they are listed
+# by class/id (e.g. UBX-05-01)
+try:
+    from pyubx2 import UBX_MSGIDS
+    MESSAGE_NAMES = {
+        **{int.from_bytes(k, 'big'): v for k, v in UBX_MSGIDS.items() if len(k) == 2},
+        **MESSAGE_NAMES,
+    }
+except ImportError:
+    pass
+
+# The file is scanned for UBX frames directly (sync chars, class/id, length,
+# payload, checksum); only the few payload fields checked below are read
+UBX_SYNC = b'\xb5\x62'
+UBX_OVERHEAD = 8  # sync (2) + class/id (2) + length (2) + checksum (2)
+
+# NAV-PVT payload layouts: the time fields (iTOW, year, month, day, hour, min,
+# sec) and the fields checked per message (valid, fixType, flags, numSV)
+NAV_PVT_TIME = struct.Struct('<IHBBBBB')
+NAV_PVT_CHECKED = struct.Struct('<11xB8xBBxB')
+NAV_PVT_VALID_TIME = 0x03  # NAV-PVT valid flags: validDate | validTime
+GPS_WEEK_MS = 7 * 24 * 3600 * 1000
+RXM_RAWX_MIN_LEN = 12  # payload bytes up to and including numMeas
+
+# Base fix types (NAV-PVT fixType)
+FIX_TYPE_NAMES = {
+    0: "NO FIX",
+    1: "DEAD RECKONING",
+    2: "2D FIX",
+    3: "3D FIX",
+    4: "GNSS+DR",
+    5: "TIME ONLY"
+}
+
+# Carrier phase solutions (NAV-PVT carrSoln)
+CARR_SOLN_NAMES = {
+    0: "No carrier",
+    1: "Float solution",
+    2: "Fixed solution"
+}
+
+# Progress is printed each time the scan passes another chunk of the file
+PROGRESS_BYTES = 1 << 20
+
+
+def ubx_checksum_ok(buf, start, end):
+    """Check the 8-bit Fletcher checksum of the UBX frame in buf[start:end]"""
+    body = buf[start + 2:end - 2]  # a copy, so no buffer export pins an mmap open
+    ck_a = sum(body) & 0xFF
+    # CK_B is the sum of the running CK_A values
+    ck_b = sum(accumulate(body)) & 0xFF
+    return buf[end - 2] == ck_a and buf[end - 1] == ck_b
+
+
+def nav_pvt_itow(payload):
+    """GPS time of week (ms) of a NAV-PVT payload"""
+    return NAV_PVT_TIME.unpack_from(payload)[0]
+
+
+def nav_pvt_datetime(payload):
+    """UTC date/time of a NAV-PVT payload, or None if it isn't a real date"""
+    try:
+        return datetime(*NAV_PVT_TIME.unpack_from(payload)[1:])
+    except ValueError:
+        return None
+
+
+def message_name(key):
+    """Name a UBX message by its class/id key, e.g. NAV-PVT"""
+    return MESSAGE_NAMES.get(key, f"UBX-{key >> 8:02X}-{key & 0xFF:02X}")
+
+
 class UBXValidator:
     """Validates UBX log files for PPK processing"""
     
@@ -17,22 +106,28 @@ class UBXValidator:
         self.filename = filename
         self.stats = {
             'total_messages': 0,
-            'message_types': defaultdict(int),
+            'message_types': [0] * 0x10000,  # count per class/id key
             'first_timestamp': None,
             'last_timestamp': None,
-            'nav_pvt_count': 0,
-            'rxm_rawx_count': 0,
+            'duration': None,  # seconds between first and last NAV-PVT
+            'rates': {},       # message rates in Hz, by name
+            'nav_pvt_count': 0,      # per-type counts are filled in from
+            'rxm_rawx_count': 0,     # message_types by _analyze()
             'rxm_sfrbx_count': 0,
             'nav_status_count': 0,
             'nav_sat_count': 0,
-            'satellites_seen': set(),
             'max_satellites': 0,
-            'fix_types': defaultdict(int),
-            'carrier_solution_types': defaultdict(int),
+            'fix_types': [0] * 0x100,  # count per NAV-PVT fixType
+            'carrier_solution_types': [0] * 4,  # count per NAV-PVT carrSoln
             'errors': [],
             'warnings': []
         }
         
+        # First and last NAV-PVT payloads with a valid time; iTOW and the date
+        # are only decoded from these two, in _analyze()
+        self._first_pvt = None
+        self._last_pvt = None
+        
     def validate(self):
         """Validate the UBX file"""
         print("\n" + "="*80)
@@ -55,23 +150,19 @@ class UBXValidator:
         # Parse file
         print("Parsing UBX messages...")
         try:
-            with open(self.filename, 'rb') as f:
-                ubr = UBXReader(f)
-                
-                for raw_data, parsed_msg in ubr:
-                    self.stats['total_messages'] += 1
-                    self._process_message(parsed_msg)
-                    
-                    # Progress indicator
-                    if self.stats['total_messages'] % 1000 == 0:
-                        print(f"\r  Processed {self.stats['total_messages']:,} messages...", 
-                              end='', flush=True)
+            # Map the file rather than reading it in; the scan only touches
+            # each page once, front to back
+            with open(self.filename, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                self._scan(mm)
         
         except Exception as e:
             print(f"\n✗ Error parsing file: {e}\n")
             return False
         
-        print(f"\r  Processed {self.stats['total_messages']:,} messages... Done!\n")
+        print(f"\r  Processed {self.stats['total_messages']:,} messages (100%)... Done!\n")
         
         # Analyze results
         self._analyze()
@@ -81,64 +172,86 @@ class UBXValidator:
         
         return len(self.stats['errors']) == 0
     
-    def _process_message(self, msg):
-        """Process a single UBX message"""
-        msg_id = msg.identity
-        self.stats['message_types'][msg_id] += 1
-        
-        # NAV-PVT: Position, velocity, time
-        if msg_id == 'NAV-PVT':
-            self.stats['nav_pvt_count'] += 1
-            
-            # Extract timestamp
-            try:
-                ts = datetime(msg.year, msg.month, msg.day, 
-                            msg.hour, msg.min, msg.second)
-                if self.stats['first_timestamp'] is None:
-                    self.stats['first_timestamp'] = ts
-                self.stats['last_timestamp'] = ts
-            except:
-                pass
-            
-            # Track fix types
-            fix_type = getattr(msg, 'fixType', None)
-            if fix_type is not None:
-                self.stats['fix_types'][fix_type] += 1
-            
-            # Track carrier solution (RTK status)
-            carr_soln = getattr(msg, 'carrSoln', None)
-            if carr_soln is not None:
-                self.stats['carrier_solution_types'][carr_soln] += 1
+    def _scan(self, buf):
+        """Walk the UBX frames in buf, skipping bytes that aren't part of a valid frame"""
+        size = len(buf)
+        pos = 0
+        total = 0
+        next_progress = PROGRESS_BYTES
+        
+        # Every message is counted; only these have payload fields to check
+        counts = self.stats['message_types']
+        decoders = {
+            NAV_PVT: self._process_nav_pvt,
+            RXM_RAWX: self._process_rxm_rawx,
+        }
+        
+        while True:
+            start = buf.find(UBX_SYNC, pos)
+            if start < 0 or size - start < UBX_OVERHEAD:
+                break
+            end = start + UBX_OVERHEAD + (buf[start + 4] | buf[start + 5] << 8)
+            if end > size or not ubx_checksum_ok(buf, start, end):
+                pos = start + 2  # not a complete frame; resync after this sync word
+                continue
+            pos = end
             
-            # Track satellites
-            num_sv = getattr(msg, 'numSV', 0)
-            if num_sv > self.stats['max_satellites']:
-                self.stats['max_satellites'] = num_sv
-        
-        # RXM-RAWX: Raw measurements (critical for PPK)
-        elif msg_id == 'RXM-RAWX':
-            self.stats['rxm_rawx_count'] += 1
+            total += 1
+            key = buf[start + 2] << 8 | buf[start + 3]
+            counts[key] += 1
+            decoder = decoders.get(key)
+            if decoder is not None:
+                decoder(buf[start + 6:end - 2])
             
-            # Track which satellites have observations
-            num_meas = getattr(msg, 'numMeas', 0)
+            # Progress indicator
+            if pos >= next_progress:
+                next_progress += PROGRESS_BYTES
+                print(f"\r  Processed {total:,} messages ({100 * pos // size}%)...", 
+                      end='', flush=True)
+        
+        self.stats['total_messages'] = total
+    
+    def _process_nav_pvt(self, payload):
+        """Process a NAV-PVT (position, velocity, time) payload"""
+        if len(payload) < NAV_PVT_CHECKED.size:
+            return
+        valid, fix_type, flags, num_sv = NAV_PVT_CHECKED.unpack_from(payload)
+        
+        # Keep the first/last time-stamped solution for the time span
+        if valid & NAV_PVT_VALID_TIME == NAV_PVT_VALID_TIME:
+            if self._first_pvt is None:
+                self._first_pvt = payload
+            self._last_pvt = payload
+        
+        # Track fix types
+        self.stats['fix_types'][fix_type] += 1
+        
+        # Track carrier solution (RTK status, flags bits 6-7)
+        self.stats['carrier_solution_types'][flags >> 6] += 1
+        
+        # Track satellites
+        if num_sv > self.stats['max_satellites']:
+            self.stats['max_satellites'] = num_sv
+    
+    def _process_rxm_rawx(self, payload):
+        """Process an RXM-RAWX (raw measurements, critical for PPK) payload"""
+        # Track which satellites have observations
+        if len(payload) >= RXM_RAWX_MIN_LEN:
+            num_meas = payload[11]
             if num_meas > self.stats['max_satellites']:
                 self.stats['max_satellites'] = num_meas
-        
-        # RXM-SFRBX: Broadcast navigation data (ephemeris - critical for PPK)
-        elif msg_id == 'RXM-SFRBX':
-            self.stats['rxm_sfrbx_count'] += 1
-        
-        # NAV-STATUS: Navigation status
-        elif msg_id == 'NAV-STATUS':
-            self.stats['nav_status_count'] += 1
-        
-        # NAV-SAT: Satellite information
-        elif msg_id == 'NAV-SAT':
-            self.stats['nav_sat_count'] += 1
     
     def _analyze(self):
         """Analyze collected statistics"""
         
+        # Per-type counts of the messages checked for PPK
+        counts = self.stats['message_types']
+        self.stats['nav_pvt_count'] = counts[NAV_PVT]
+        self.stats['rxm_rawx_count'] = counts[RXM_RAWX]
+        self.stats['rxm_sfrbx_count'] = counts[RXM_SFRBX]
+        self.stats['nav_status_count'] = counts[NAV_STATUS]
+        self.stats['nav_sat_count'] = counts[NAV_SAT]
+        
         # Check for critical message types
         if self.stats['rxm_rawx_count'] == 0:
             self.stats['errors'].append(
@@ -150,23 +263,34 @@ class UBXValidator:
                 "No RXM-SFRBX messages found! These contain ephemeris data REQUIRED for PPK."
             )
         
+        # Time span and message rates (computed once, also used by the report)
+        if self._first_pvt is not None:
+            self.stats['first_timestamp'] = nav_pvt_datetime(self._first_pvt)
+            self.stats['last_timestamp'] = nav_pvt_datetime(self._last_pvt)
+            
+            # iTOW difference, allowing for one rollover at the end of a GPS week
+            itow_ms = nav_pvt_itow(self._last_pvt) - nav_pvt_itow(self._first_pvt)
+            seconds = (itow_ms % GPS_WEEK_MS) / 1000.0
+            self.stats['duration'] = seconds
+            
+            if seconds > 0:
+                self.stats['rates'] = {
+                    'NAV-PVT': self.stats['nav_pvt_count'] / seconds,
+                    'RXM-RAWX': self.stats['rxm_rawx_count'] / seconds,
+                }
+        
         # Check message rates
-        if self.stats['first_timestamp'] and self.stats['last_timestamp']:
-            duration = (self.stats['last_timestamp'] - self.stats['first_timestamp']).total_seconds()
+        rates = self.stats['rates']
+        if rates:
+            if rates['NAV-PVT'] < 9.5:  # Allow some tolerance
+                self.stats['warnings'].append(
+                    f"NAV-PVT rate is {rates['NAV-PVT']:.1f} Hz (expected ~10 Hz)"
+                )
             
-            if duration > 0:
-                nav_pvt_rate = self.stats['nav_pvt_count'] / duration
-                rxm_rawx_rate = self.stats['rxm_rawx_count'] / duration
-                
-                if nav_pvt_rate < 9.5:  # Allow some tolerance
-                    self.stats['warnings'].append(
-                        f"NAV-PVT rate is {nav_pvt_rate:.1f} Hz (expected ~10 Hz)"
-                    )
-                
-                if rxm_rawx_rate < 9.5:
-                    self.stats['warnings'].append(
-                        f"RXM-RAWX rate is {rxm_rawx_rate:.1f} Hz (expected ~10 Hz)"
-                    )
+            if rates['RXM-RAWX'] < 9.5:
+                self.stats['warnings'].append(
+                    f"RXM-RAWX rate is {rates['RXM-RAWX']:.1f} Hz (expected ~10 Hz)"
+                )
         
         # Check satellite count
         if self.stats['max_satellites'] < 5:
@@ -182,12 +306,12 @@ class UBXValidator:
         print("="*80 + "\n")
         
         # Time span
-        if self.stats['first_timestamp'] and self.stats['last_timestamp']:
-            duration = self.stats['last_timestamp'] - self.stats['first_timestamp']
+        seconds = self.stats['duration']
+        if seconds is not None:
             print(f"Time Span:")
             print(f"  Start:    {self.stats['first_timestamp']}")
             print(f"  End:      {self.stats['last_timestamp']}")
-            print(f"  Duration: {duration} ({duration.total_seconds():.1f} seconds)")
+            print(f"  Duration: {timedelta(seconds=round(seconds))} ({seconds:.1f} seconds)")
             print()
         
         # Message statistics
@@ -197,15 +321,11 @@ class UBXValidator:
         
         # Critical messages for PPK
         print("Critical Messages for PPK:")
+        rates = self.stats['rates']
         print(f"  ✓ RXM-RAWX (raw observations):  {self.stats['rxm_rawx_count']:,} messages", end='')
         if self.stats['rxm_rawx_count'] > 0:
-            if self.stats['last_timestamp']:
-                duration = (self.stats['last_timestamp'] - self.stats['first_timestamp']).total_seconds()
-                if duration > 0:
-                    rate = self.stats['rxm_rawx_count'] / duration
-                    print(f" ({rate:.1f} Hz)")
-                else:
-                    print()
+            if rates:
+                print(f" ({rates['RXM-RAWX']:.1f} Hz)")
             else:
                 print()
         else:
@@ -221,13 +341,8 @@ class UBXValidator:
         # Position/status messages
         print("Position/Status Messages:")
         print(f"  NAV-PVT (position/velocity):    {self.stats['nav_pvt_count']:,} messages", end='')
-        if self.stats['nav_pvt_count'] > 0 and self.stats['last_timestamp']:
-            duration = (self.stats['last_timestamp'] - self.stats['first_timestamp']).total_seconds()
-            if duration > 0:
-                rate = self.stats['nav_pvt_count'] / duration
-                print(f" ({rate:.1f} Hz)")
-            else:
-                print()
+        if self.stats['nav_pvt_count'] > 0 and rates:
+            print(f" ({rates['NAV-PVT']:.1f} Hz)")
         else:
             print()
         
@@ -236,34 +351,23 @@ class UBXValidator:
         print()
         
         # Fix type distribution
-        if self.stats['fix_types']:
-            fix_type_names = {
-                0: "NO FIX",
-                1: "DEAD RECKONING",
-                2: "2D FIX",
-                3: "3D FIX",
-                4: "GNSS+DR",
-                5: "TIME ONLY"
-            }
-            
+        if any(self.stats['fix_types']):
             print("Fix Type Distribution:")
-            for fix_type, count in sorted(self.stats['fix_types'].items()):
-                name = fix_type_names.get(fix_type, f"UNKNOWN ({fix_type})")
+            for fix_type, count in enumerate(self.stats['fix_types']):
+                if not count:
+                    continue
+                name = FIX_TYPE_NAMES.get(fix_type) or f"UNKNOWN ({fix_type})"
                 percent = 100 * count / self.stats['nav_pvt_count'] if self.stats['nav_pvt_count'] > 0 else 0
                 print(f"  {name:20s}: {count:5d} ({percent:5.1f}%)")
             print()
         
         # Carrier solution distribution (RTK status)
-        if self.stats['carrier_solution_types']:
-            carr_soln_names = {
-                0: "No carrier",
-                1: "Float solution",
-                2: "Fixed solution"
-            }
-            
+        if any(self.stats['carrier_solution_types']):
             print("RTK Carrier Solution Distribution:")
-            for carr_soln, count in sorted(self.stats['carrier_solution_types'].items()):
-                name = carr_soln_names.get(carr_soln, f"UNKNOWN ({carr_soln})")
+            for carr_soln, count in enumerate(self.stats['carrier_solution_types']):
+                if not count:
+                    continue
+                name = CARR_SOLN_NAMES.get(carr_soln) or f"UNKNOWN ({carr_soln})"
                 percent = 100 * count / self.stats['nav_pvt_count'] if self.stats['nav_pvt_count'] > 0 else 0
                 print(f"  {name:20s}: {count:5d} ({percent:5.1f}%)")
             print()
@@ -275,9 +379,11 @@ class UBXValidator:
         
         # All message types
         print("All Message Types:")
-        for msg_type, count in sorted(self.stats['message_types'].items(), 
-                                      key=lambda x: x[1], reverse=True):
-            print(f"  {msg_type:20s}: {count:,}")
+        counts = self.stats['message_types']
+        # Non-zero slots of the count table, most frequent first
+        seen = compress(range(len(counts)), counts)
+        for key in sorted(seen, key=counts.__getitem__, reverse=True):
+            print(f"  {message_name(key):20s}: {counts[key]:,}")
         print()
         
         # Warnings